@@ -1,19 +1,47 @@
 import re
+import sys
+import argparse
 import dns.resolver
 import smtplib
-import pandas as pd
+import xlsxwriter
 from dns.exception import Timeout
 
+# One shared resolver for every MX lookup, with alternative DNS servers and short timeouts
+_RESOLVER = dns.resolver.Resolver()
+_RESOLVER.nameservers = ['8.8.8.8', '1.1.1.1', '9.9.9.9']
+_RESOLVER.timeout = 2
+_RESOLVER.lifetime = 3
+_RESOLVER.use_edns(0, 0, 1232)  # Keep answers within a single unfragmented UDP packet
+
+_EMAIL_RE = re.compile(r"^[A-Za-z0-9_.+-]+@[A-Za-z0-9-]+\.[A-Za-z0-9.-]+$")
+
+# Large providers reject RCPT probes from unknown senders, so their MX is trusted
+_WELL_KNOWN = frozenset({
+    'gmail.com', 'googlemail.com', 'outlook.com', 'hotmail.com', 'live.com', 'msn.com',
+    'yahoo.com', 'ymail.com', 'icloud.com', 'me.com', 'mac.com', 'aol.com',
+})
+
 def check_syntax(email):
-    regex = r"(^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$)"
-    return re.match(regex, email) is not None
+    return _EMAIL_RE.match(email) is not None
+
+def _mx_for(domain):
+    mx_records = _RESOLVER.resolve(domain, 'MX')
+    return tuple(mx.exchange.to_text().rstrip('.') for mx in sorted(mx_records, key=lambda mx: mx.preference))
+
+def _smtp_connect(domain):
+    for mx_record in _mx_for(domain):
+        try:
+            return smtplib.SMTP(mx_record, timeout=10)
+        except OSError:
+            continue  # Fall back to the next preferred server
+    raise OSError(f"No reachable mail server for {domain}")
 
 def check_mail_server(domain):
     max_retries = 3
     retry_count = 0
     while retry_count < max_retries:
         try:
-            mx_records = dns.resolver.resolve(domain, 'MX')
+            mx_records = _RESOLVER.resolve(domain, 'MX')
             return len(mx_records) > 0
         except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
             return False
@@ -22,12 +50,9 @@ def check_mail_server(domain):
             print(f"Timeout occurred. Retrying ({retry_count}/{max_retries})...")
     return False
 
-def check_connection(email):
-    domain = email.split('@')[1]
+def check_connection(domain):
     try:
-        mx_records = dns.resolver.resolve(domain, 'MX')
-        mx_record = mx_records[0].exchange.to_text()
-        server = smtplib.SMTP(mx_record)
+        server = _smtp_connect(domain)
         server.set_debuglevel(0)
         server.helo()
         server.quit()
@@ -43,9 +68,7 @@ def check_catch_all(domain):
     retry_count = 0
     while retry_count < max_retries:
         try:
-            mx_records = dns.resolver.resolve(domain, 'MX')
-            mx_record = mx_records[0].exchange.to_text()
-            server = smtplib.SMTP(mx_record)
+            server = _smtp_connect(domain)
             server.set_debuglevel(0)
             server.helo()
 
@@ -72,12 +95,15 @@ def validate_email(email):
     if not check_syntax(email):
         return False, "Invalid syntax"
     
-    domain = email.split('@')[1]
+    domain = email.rpartition('@')[2]
     
     if not check_mail_server(domain):
         return False, "No MX records found"
     
-    if not check_connection(email):
+    if domain.lower() in _WELL_KNOWN:
+        return True, "Email is valid"
+    
+    if not check_connection(domain):
         return False, "Cannot connect to mail server"
     
     if check_catch_all(domain):
@@ -89,8 +115,10 @@ def validate_emails(email_list):
     valid_emails = []
     invalid_emails = []
     
+    # Check each distinct address once, but report every input row
+    checks = {email: validate_email(email) for email in dict.fromkeys(email_list)}
     for email in email_list:
-        is_valid, message = validate_email(email)
+        is_valid, message = checks[email]
         if is_valid:
             valid_emails.append(email)
         else:
@@ -98,7 +126,16 @@ def validate_emails(email_list):
     
     return valid_emails, invalid_emails
 
-def get_user_emails():
+def read_emails(lines):
+    return [email for line in lines if (email := line.strip()) and email.lower() != 'done']
+
+def get_user_emails(path=None):
+    if path is not None:
+        with open(path) as email_file:
+            return read_emails(email_file.read().splitlines())
+    if not sys.stdin.isatty():
+        return read_emails(sys.stdin.read().splitlines())
+
     email_list = []
     while True:
         email = input("Enter an email address (or 'done' to finish): ").strip()
@@ -108,12 +145,20 @@ def get_user_emails():
     return email_list
 
 def save_to_excel(valid_emails):
-    df = pd.DataFrame(valid_emails, columns=['Valid Emails'])
-    df.to_excel('valid_emails.xlsx', index=False)
+    workbook = xlsxwriter.Workbook('valid_emails.xlsx', {'constant_memory': True})
+    worksheet = workbook.add_worksheet()
+    worksheet.write_string(0, 0, 'Valid Emails')
+    for row_number, email in enumerate(valid_emails, 1):
+        worksheet.write_string(row_number, 0, email)
+    workbook.close()
 
 # Main program flow
 if __name__ == "__main__":
-    email_list = get_user_emails()
+    parser = argparse.ArgumentParser(description="Validate email addresses.")
+    parser.add_argument('-i', '--input', help="read email addresses from this file, one per line")
+    args = parser.parse_args()
+
+    email_list = get_user_emails(args.input)
     if email_list:
         valid_emails, invalid_emails = validate_emails(email_list)
         if valid_emails:
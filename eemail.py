@@ -1,24 +1,48 @@
 import re
+import sys
+import argparse
 import dns.resolver
 import smtplib
+from cachetools import TTLCache, cached
+
+# One shared resolver for every MX lookup, with alternative DNS servers and short timeouts
+_RESOLVER = dns.resolver.Resolver()
+_RESOLVER.nameservers = ['8.8.8.8', '1.1.1.1', '9.9.9.9']
+_RESOLVER.timeout = 2
+_RESOLVER.lifetime = 3
+_RESOLVER.use_edns(0, 0, 1232)  # Keep answers within a single unfragmented UDP packet
+
+# Per-domain lookups and probes are reused for this many seconds
+CACHE_TTL = 300
+CACHE_SIZE = 4096
+
+_EMAIL_RE = re.compile(r"^[A-Za-z0-9_.+-]+@[A-Za-z0-9-]+\.[A-Za-z0-9.-]+$")
 
 def check_syntax(email):
-    regex = r"(^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$)"
-    return re.match(regex, email) is not None
+    return _EMAIL_RE.match(email) is not None
 
-def check_mail_server(domain):
+@cached(TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL))
+def _mx_for(domain):
     try:
-        mx_records = dns.resolver.resolve(domain, 'MX')
-        return len(mx_records) > 0
+        mx_records = _RESOLVER.resolve(domain, 'MX')
+        return tuple(mx.exchange.to_text().rstrip('.') for mx in sorted(mx_records, key=lambda mx: mx.preference))
     except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
-        return False
+        return ()
 
-def check_connection(email):
-    domain = email.split('@')[1]
+def _smtp_connect(domain):
+    for mx_record in _mx_for(domain):
+        try:
+            return smtplib.SMTP(mx_record, timeout=10)
+        except OSError:
+            continue  # Fall back to the next preferred server
+    raise OSError(f"No reachable mail server for {domain}")
+
+def check_mail_server(domain):
+    return len(_mx_for(domain)) > 0
+
+def check_connection(domain):
     try:
-        mx_records = dns.resolver.resolve(domain, 'MX')
-        mx_record = mx_records[0].exchange.to_text()
-        server = smtplib.SMTP(mx_record)
+        server = _smtp_connect(domain)
         server.set_debuglevel(0)
         server.helo()
         server.quit()
@@ -29,25 +53,27 @@ def check_connection(email):
 def is_gmail_domain(domain):
     return domain.lower() == 'gmail.com'
 
+# Only completed probes are cached; a failed one raises and is tried again by the next check
+@cached(TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL))
+def _probe_catch_all(domain):
+    server = _smtp_connect(domain)
+    server.set_debuglevel(0)
+    server.helo()
+
+    if is_gmail_domain(domain):
+        server.mail('test@gmail.com')
+        code, message = server.rcpt('fake-email@gmail.com')
+        server.quit()
+        return code != 550
+    else:
+        server.mail('test@example.com')
+        code, message = server.rcpt('fake-email@' + domain)
+        server.quit()
+        return code == 250
+
 def check_catch_all(domain):
     try:
-        mx_records = dns.resolver.resolve(domain, 'MX')
-        mx_record = mx_records[0].exchange.to_text()
-        server = smtplib.SMTP(mx_record)
-        server.set_debuglevel(0)
-        server.helo()
-
-        if is_gmail_domain(domain):
-            server.mail('test@gmail.com')
-            code, message = server.rcpt('fake-email@gmail.com')
-            server.quit()
-            return code != 550
-        else:
-            server.mail('test@example.com')
-            code, message = server.rcpt('fake-email@' + domain)
-            server.quit()
-            return code == 250
-        
+        return _probe_catch_all(domain)
     except Exception as e:
         return False
 
@@ -55,12 +81,12 @@ def validate_email(email):
     if not check_syntax(email):
         return False, "Invalid syntax"
     
-    domain = email.split('@')[1]
+    domain = email.rpartition('@')[2]
     
     if not check_mail_server(domain):
         return False, "No MX records found"
     
-    if not check_connection(email):
+    if not check_connection(domain):
         return False, "Cannot connect to mail server"
     
     if check_catch_all(domain):
@@ -69,14 +95,25 @@ def validate_email(email):
     return True, "Email is valid"
 
 def validate_emails(email_list):
+    # Check each distinct address once, but report every input row
+    checks = {email: validate_email(email) for email in dict.fromkeys(email_list)}
     for email in email_list:
-        is_valid, message = validate_email(email)
+        is_valid, message = checks[email]
         if is_valid:
             print(f"{email}: VALID")
         else:
             print(f"{email}: INVALID - {message}")
 
-def get_user_emails():
+def read_emails(lines):
+    return [email for line in lines if (email := line.strip()) and email.lower() != 'done']
+
+def get_user_emails(path=None):
+    if path is not None:
+        with open(path) as email_file:
+            return read_emails(email_file.read().splitlines())
+    if not sys.stdin.isatty():
+        return read_emails(sys.stdin.read().splitlines())
+
     email_list = []
     while True:
         email = input("Enter an email address (or 'done' to finish): ").strip()
@@ -87,7 +124,11 @@ def get_user_emails():
 
 # Main program flow
 if __name__ == "__main__":
-    email_list = get_user_emails()
+    parser = argparse.ArgumentParser(description="Validate email addresses.")
+    parser.add_argument('-i', '--input', help="read email addresses from this file, one per line")
+    args = parser.parse_args()
+
+    email_list = get_user_emails(args.input)
     if email_list:
         validate_emails(email_list)
     else:
@@ -1,107 +1,280 @@
 import re
+import csv
+import argparse
+import asyncio
 import dns.resolver
-import smtplib
-import pandas as pd
+import dns.asyncresolver
+import aiosmtplib
 import os
+import uuid
+import sys
+import itertools
+import multiprocessing as mp
 import logging
+from collections import defaultdict
 from dns.exception import Timeout
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import asynccontextmanager, ExitStack
+from cachetools import TTLCache
+
+try:
+    from uvloop import run as run_event_loop  # libuv event loop, less work per socket wakeup
+except ImportError:  # Run on the standard asyncio event loop instead
+    run_event_loop = asyncio.run
 
 # Configure logging
 logging.basicConfig(filename='email_validation.log', level=logging.INFO, format='%(asctime)s - %(message)s')
 
+# Every SMTP command and reply is traced to this logger, which logs them only when SMTP_DEBUG is set
+_smtp_trace = logging.getLogger('smtp')
+if os.environ.get('SMTP_DEBUG'):
+    _smtp_trace.setLevel(logging.DEBUG)
+
 # Regex pattern for email validation
-EMAIL_REGEX = r"(^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$)"
+_EMAIL_RE = re.compile(r"^[A-Za-z0-9_.+-]+@[A-Za-z0-9-]+\.[A-Za-z0-9.-]+$")
+
+# One shared resolver for every MX lookup, with alternative DNS servers and short timeouts
+_RESOLVER = dns.asyncresolver.Resolver()
+_RESOLVER.nameservers = ['8.8.8.8', '1.1.1.1', '9.9.9.9']
+_RESOLVER.timeout = 2
+_RESOLVER.lifetime = 3
+_RESOLVER.use_edns(0, 0, 1232)  # Keep answers within a single unfragmented UDP packet
+
+# Per-domain lookups and probes are reused for this many seconds
+CACHE_TTL = 300
+CACHE_SIZE = 4096
+
+# MX hostnames and catch-all results per domain, shared by all checks of a worker process
+_mx_cache = TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+_catch_all_cache = TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+
+# Maximum number of MX lookups in flight at once, split between the worker processes
+DNS_CONCURRENCY = 200
+
+# Worker processes validating domain shards, sharing the SMTP connection budget
+PROCESS_COUNT = os.cpu_count() or 1
+SHARDS_PER_PROCESS = 4
+MAX_CONNECTIONS = 500
+
+# Large providers reject RCPT probes from unknown senders, so their MX is trusted
+_WELL_KNOWN = frozenset({
+    'gmail.com', 'googlemail.com', 'outlook.com', 'hotmail.com', 'live.com', 'msn.com',
+    'yahoo.com', 'ymail.com', 'icloud.com', 'me.com', 'mac.com', 'aol.com',
+})
+
+# Recipients probed per SMTP transaction before issuing RSET
+RCPT_PER_TRANSACTION = 50
 
 def check_syntax(email):
     """ Check if the email matches the standard email address pattern. """
-    return re.match(EMAIL_REGEX, email) is not None
+    return _EMAIL_RE.match(email) is not None
 
-def check_mail_server(domain):
-    """ Check if the domain has MX records. """
+async def gather_bounded(limit, coroutines):
+    """ Run coroutines concurrently, at most `limit` at a time, and return their results or exceptions. """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def bounded(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*(bounded(coroutine) for coroutine in coroutines), return_exceptions=True)
+
+def _by_preference(mx_records):
+    """ Return MX hostnames ordered from the most to the least preferred server. """
+    return tuple(mx.exchange.to_text().rstrip('.') for mx in sorted(mx_records, key=lambda mx: mx.preference))
+
+async def resolve_mx(domain):
+    """ Resolve the MX hostnames of a domain without blocking the event loop. """
     try:
-        mx_records = dns.resolver.resolve(domain, 'MX')
-        return len(mx_records) > 0
-    except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN, Timeout):
-        return False
+        mx_records = await _RESOLVER.resolve(domain, 'MX')
+        return domain, _by_preference(mx_records)
+    except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
+        return domain, ()
     except Exception as e:
         logging.error(f"Error resolving MX records for {domain}: {e}")
-        return False
+        return domain, None
 
-def check_connection(email):
-    """ Check if we can establish an SMTP connection to the email domain. """
-    domain = email.split('@')[1]
-    try:
-        mx_records = dns.resolver.resolve(domain, 'MX')
-        mx_record = str(mx_records[0].exchange)
+async def prefetch_mx(domains):
+    """ Resolve MX records for all domains concurrently and fill the cache. """
+    limit = max(1, DNS_CONCURRENCY // PROCESS_COUNT)
+    for domain, mx_hosts in await gather_bounded(limit, map(resolve_mx, domains)):
+        if mx_hosts is not None:  # Failed lookups are retried by the checks
+            _mx_cache[domain] = mx_hosts
+
+async def _mx_for(domain):
+    """ Return the MX hostnames of a domain, resolving it on a cache miss. """
+    mx_hosts = _mx_cache.get(domain)
+    if mx_hosts is None:
+        try:
+            mx_records = await _RESOLVER.resolve(domain, 'MX')
+            mx_hosts = _by_preference(mx_records)
+        except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
+            mx_hosts = ()
+        _mx_cache[domain] = mx_hosts
+    return mx_hosts
+
+@asynccontextmanager
+async def _smtp_session(domain):
+    """ Open an SMTP session to the domain's mail servers in preference order, falling back on failure. """
+    server = None
+    error = aiosmtplib.SMTPConnectError(f"No mail server found for {domain}")
+    for mx_record in await _mx_for(domain):
         print(f"Trying to connect to MX record: {mx_record}")
-        with smtplib.SMTP(mx_record, timeout=10) as server:
-            server.set_debuglevel(1)  # Enable debug output
-            server.ehlo_or_helo_if_needed()
-            server.mail('test@example.com')
-            code, message = server.rcpt(email)
-            if code == 250:
-                return True
-            else:
-                logging.info(f"Failed to validate {email}: {message}")
-                return False
+        try:
+            server = aiosmtplib.SMTP(hostname=mx_record, port=25, timeout=10, start_tls=False)
+            response = await server.connect()
+            _smtp_trace.debug("%s: connected -> %s %s", mx_record, response.code, response.message)
+            break
+        except aiosmtplib.SMTPConnectError as e:
+            server, error = None, e
+    if server is None:
+        raise error
+    try:
+        yield server
+    finally:
+        try:
+            await server.quit()
+        except aiosmtplib.SMTPException:
+            server.close()
+
+async def _mail(server, sender):
+    """ Send MAIL FROM, greeting with EHLO/HELO first if the session has not yet. """
+    response = await server.mail(sender)
+    _smtp_trace.debug("%s: MAIL FROM:<%s> -> %s %s", server.hostname, sender, response.code, response.message)
+
+async def _rcpt(server, recipient):
+    """ Send RCPT TO and return the reply code and message, also when it is refused. """
+    try:
+        response = await server.rcpt(recipient)
+        code, message = response.code, response.message
+    except aiosmtplib.SMTPRecipientRefused as e:
+        code, message = e.code, e.message
+    _smtp_trace.debug("%s: RCPT TO:<%s> -> %s %s", server.hostname, recipient, code, message)
+    return code, message
+
+async def check_mail_server(domain):
+    """ Check if the domain has MX records. """
+    try:
+        return len(await _mx_for(domain)) > 0
+    except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN, Timeout):
+        return False
     except Exception as e:
-        logging.error(f"Error connecting to mail server for {email}: {e}")
+        logging.error(f"Error resolving MX records for {domain}: {e}")
         return False
 
 def is_gmail_domain(domain):
     """ Check if the domain is 'gmail.com'. """
     return domain.lower() == 'gmail.com'
 
-def check_catch_all(domain):
-    """ Check if the domain has a catch-all email address enabled. """
+async def probe_mailboxes(domain, emails):
+    """ Probe for a catch-all and then each address of a domain over a single SMTP session. """
+    if _catch_all_cache.get(domain):
+        return [(email, "Valid") for email in emails]  # Consider catch-all domains as valid
+    results = []
     try:
-        mx_records = dns.resolver.resolve(domain, 'MX')
-        mx_record = str(mx_records[0].exchange)
-        with smtplib.SMTP(mx_record, timeout=10) as server:
-            server.ehlo_or_helo_if_needed()
-            server.mail('test@example.com')
-            code, _ = server.rcpt(f'nonexistent@{domain}')
-            return code == 250
+        async with _smtp_session(domain) as server:
+            await _mail(server, 'test@example.com')
+            if domain not in _catch_all_cache:
+                # A random address is only accepted by servers that accept everything
+                code, _ = await _rcpt(server, f'{uuid.uuid4().hex}@{domain}')
+                _catch_all_cache[domain] = code == 250
+                if code == 250:
+                    return [(email, "Valid") for email in emails]
+            for count, email in enumerate(emails, 1):
+                code, message = await _rcpt(server, email)
+                if code == 250:
+                    results.append((email, "Valid"))
+                else:
+                    logging.info(f"Failed to validate {email}: {message}")
+                    results.append((email, "Cannot connect to mail server"))
+                if count % RCPT_PER_TRANSACTION == 0:
+                    # Start a fresh transaction before the server's recipient limit
+                    response = await server.rset()
+                    _smtp_trace.debug("%s: RSET -> %s %s", server.hostname, response.code, response.message)
+                    await _mail(server, 'test@example.com')
     except Exception as e:
-        logging.error(f"Error checking catch-all for {domain}: {e}")
-        return False
+        logging.error(f"Error connecting to mail server for {domain}: {e}")
+    results.extend((email, "Cannot connect to mail server") for email in emails[len(results):])
+    return results
+
+async def validate_domain_group(domain, local_parts):
+    """ Validate all addresses of one domain, sharing its lookups and SMTP session. """
+    emails = [f'{local_part}@{domain}' for local_part in local_parts]
 
-def validate_email(email):
+    if not await check_mail_server(domain):
+        return [(email, "No MX records found") for email in emails]
+    
+    if domain.lower() in _WELL_KNOWN:
+        return [(email, "Valid") for email in emails]
+    
+    return await probe_mailboxes(domain, emails)
+
+async def validate_email(email):
     """ Validate an email address using various checks. """
     if not check_syntax(email):
         return email, "Invalid syntax"
     
-    domain = email.split('@')[1]
-    
-    if not check_mail_server(domain):
-        return email, "No MX records found"
-    
-    if check_catch_all(domain):
-        return email, "Valid"  # Consider catch-all domains as valid
-    
-    if not check_connection(email):
-        return email, "Cannot connect to mail server"
-    
-    return email, "Valid"
+    local_part, _, domain = email.rpartition('@')
+    return (await validate_domain_group(domain, [local_part]))[0]
+
+async def _check_shard(groups):
+    """ Resolve the MX records of a shard's domains, then validate its domain groups. """
+    await prefetch_mx(domain for domain, _ in groups)
+    limit = max(1, MAX_CONNECTIONS // PROCESS_COUNT)
+    group_results = await gather_bounded(
+        limit, (validate_domain_group(domain, local_parts) for domain, local_parts in groups))
+    shard_results = []
+    for (domain, local_parts), results in zip(groups, group_results):
+        if isinstance(results, Exception):  # Report the group instead of failing the whole shard
+            logging.error(f"Error validating {domain}: {results}")
+            results = [(f'{local_part}@{domain}', "Cannot connect to mail server") for local_part in local_parts]
+        shard_results.extend(results)
+    return shard_results
+
+def _validate_shard(groups):
+    """ Validate the domain groups of one shard on an event loop inside a worker process. """
+    return run_event_loop(_check_shard(groups))
 
 def validate_emails(email_list):
     """ Validate a list of email addresses and return results. """
-    results = []
-    total_emails = len(email_list)
+    unique_emails = list(dict.fromkeys(email_list))
+    status_by_email = {}
+    total_emails = len(unique_emails)
+    emails_by_domain = defaultdict(list)
+    for email in unique_emails:
+        if check_syntax(email):
+            local_part, _, domain = email.rpartition('@')
+            emails_by_domain[domain].append(local_part)
+        else:
+            status_by_email[email] = "Invalid syntax"
+
+    # Keep every domain in a single shard, which resolves its MX records in its worker process
+    shard_count = PROCESS_COUNT * SHARDS_PER_PROCESS
+    shards = [[] for _ in range(shard_count)]
+    for domain, local_parts in emails_by_domain.items():
+        shards[hash(domain) % shard_count].append((domain, local_parts))
     
-    with ThreadPoolExecutor(max_workers=50) as executor:
-        futures = [executor.submit(validate_email, email) for email in email_list]
-        
-        for future in as_completed(futures):
-            results.append(future.result())
-            print(f"Processed: {len(results)}/{total_emails}", end='\r')
+    with mp.Pool(PROCESS_COUNT) as pool:
+        for shard_results in pool.imap_unordered(_validate_shard, shards):
+            status_by_email.update(shard_results)
+            print(f"Processed: {len(status_by_email)}/{total_emails}", end='\r')
     
     print("\nValidation complete.")
-    return results
 
-def get_user_emails():
-    """ Prompt user to enter email addresses. """
+    # Report every input row, including repeated addresses
+    return [(email, status_by_email[email]) for email in email_list]
+
+def read_emails(lines):
+    """ Collect one email address per non-empty line, skipping a 'done' marker. """
+    return [email for line in lines if (email := line.strip()) and email.lower() != 'done']
+
+def get_user_emails(path=None):
+    """ Read email addresses from a file or piped stdin, or prompt the user for them. """
+    if path is not None:
+        with open(path) as email_file:
+            return read_emails(email_file.read().splitlines())
+    if not sys.stdin.isatty():
+        return read_emails(sys.stdin.read().splitlines())
+
     email_list = []
     while True:
         email = input("Enter an email address (or 'done' to finish): ").strip()
@@ -113,30 +286,79 @@ def get_user_emails():
 # Ensure the directory exists before writing files
 os.makedirs('outputs', exist_ok=True)
 
+def open_sheet(stack, filename, sheet_name, columns):
+    """ Open a workbook on `stack` and return a function that appends one row, flushing it to disk. """
+    import xlsxwriter  # Only needed for --xlsx, keep it off the default path
+    workbook = xlsxwriter.Workbook(filename, {'constant_memory': True, 'strings_to_formulas': False,
+                                              'strings_to_urls': False})
+    stack.callback(workbook.close)
+    worksheet = workbook.add_worksheet(sheet_name)
+    worksheet.write_row(0, 0, columns)
+    row_numbers = itertools.count(1)
+    return lambda row: worksheet.write_row(next(row_numbers), 0, row)
+
+# Spreadsheet programs evaluate CSV cells starting with these characters as formulas
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+def _as_text(row):
+    """ Quote a leading formula character of raw input that failed the syntax check. """
+    # Addresses that passed the syntax check cannot hold a formula and are written as they are
+    email, status = row
+    if status == "Invalid syntax" and email.startswith(_FORMULA_PREFIXES):
+        return f"'{email}", status
+    return row
+
+def open_csv(stack, filename, sheet_name, columns):
+    """ Open a CSV file on `stack` below a header line and return a function that appends one row. """
+    csv_file = stack.enter_context(open(filename, 'w', newline=''))
+    writer = csv.writer(csv_file)
+    writer.writerow(columns)
+    return lambda row: writer.writerow(_as_text(row))
+
+def write_results(emails, valid_filename, invalid_filename, open_output):
+    """ Write each result to the valid or invalid file as it is read, creating a file only for its first row. """
+    filenames = {'Valid': valid_filename, 'Invalid': invalid_filename}
+    append_row = {}
+    with ExitStack() as stack:
+        for email, status in emails:
+            kind = 'Valid' if status == "Valid" else 'Invalid'
+            if kind not in append_row:
+                append_row[kind] = open_output(stack, filenames[kind], kind, ['Email', 'Status'])
+            append_row[kind]((email, status))
+
+    for kind, filename in filenames.items():
+        if kind in append_row:
+            print(f"{kind} emails saved to '{filename}'")
+
 def save_to_excel(emails, valid_filename, invalid_filename):
     """ Save validation results to separate Excel files for valid and invalid emails. """
-    valid_emails = [(email, status) for email, status in emails if status == "Valid"]
-    invalid_emails = [(email, status) for email, status in emails if status != "Valid"]
-
     try:
-        if valid_emails:
-            pd.DataFrame(valid_emails, columns=['Email', 'Status']).to_excel(valid_filename, index=False, sheet_name='Valid')
-            print(f"Valid emails saved to '{valid_filename}'")
+        write_results(emails, valid_filename, invalid_filename, open_sheet)
+    except Exception as e:
+        print(f"Error saving to files: {e}")
 
-        if invalid_emails:
-            pd.DataFrame(invalid_emails, columns=['Email', 'Status']).to_excel(invalid_filename, index=False, sheet_name='Invalid')
-            print(f"Invalid emails saved to '{invalid_filename}'")
+def save_to_csv(emails, valid_filename, invalid_filename):
+    """ Save validation results to separate CSV files for valid and invalid emails. """
+    try:
+        write_results(emails, valid_filename, invalid_filename, open_csv)
     except Exception as e:
         print(f"Error saving to files: {e}")
 
 # Main program flow
 if __name__ == "__main__":
-    email_list = get_user_emails()
+    parser = argparse.ArgumentParser(description="Validate email addresses.")
+    parser.add_argument('-i', '--input', help="read email addresses from this file, one per line")
+    parser.add_argument('--xlsx', action='store_true', help="save results as Excel workbooks instead of CSV")
+    args = parser.parse_args()
+
+    email_list = get_user_emails(args.input)
     if email_list:
         results = validate_emails(email_list)
-        valid_filename = 'outputs/valid_emails.xlsx'
-        invalid_filename = 'outputs/invalid_emails.xlsx'
-        save_to_excel(results, valid_filename, invalid_filename)
+        extension = 'xlsx' if args.xlsx else 'csv'
+        valid_filename = f'outputs/valid_emails.{extension}'
+        invalid_filename = f'outputs/invalid_emails.{extension}'
+        save_results = save_to_excel if args.xlsx else save_to_csv
+        save_results(results, valid_filename, invalid_filename)
         
         print("\nDetailed results:")
         for email, status in results:
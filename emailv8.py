@@ -1,98 +1,272 @@
 import re
+import csv
+import argparse
+import asyncio
 import dns.resolver
-import smtplib
-import pandas as pd
+import dns.asyncresolver
+import aiosmtplib
 import os
-from dns.exception import Timeout
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import uuid
+import sys
+import itertools
+import multiprocessing as mp
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager, ExitStack
+from cachetools import TTLCache
+
+try:
+    from uvloop import run as run_event_loop  # libuv event loop, less work per socket wakeup
+except ImportError:  # Run on the standard asyncio event loop instead
+    run_event_loop = asyncio.run
+
+# Configure logging
+logging.basicConfig(filename='email_validation.log', level=logging.INFO, format='%(asctime)s - %(message)s')
 
 # Regex pattern for email validation
-EMAIL_REGEX = r"(^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$)"
+_EMAIL_RE = re.compile(r"^[A-Za-z0-9_.+-]+@[A-Za-z0-9-]+\.[A-Za-z0-9.-]+$")
+
+# One shared resolver for every MX lookup, with alternative DNS servers and short timeouts
+_RESOLVER = dns.asyncresolver.Resolver()
+_RESOLVER.nameservers = ['8.8.8.8', '1.1.1.1', '9.9.9.9']
+_RESOLVER.timeout = 2
+_RESOLVER.lifetime = 3
+_RESOLVER.use_edns(0, 0, 1232)  # Keep answers within a single unfragmented UDP packet
+
+# Per-domain lookups and probes are reused for this many seconds
+CACHE_TTL = 300
+CACHE_SIZE = 4096
+
+# MX hostnames and catch-all verdicts per domain, shared by all checks of a worker process
+_mx_cache = TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+_catch_all_cache = TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+
+# Verdict passed to waiting checks when the catch-all probe could not reach the mail server
+_UNREACHABLE = object()
+
+# Maximum number of MX lookups in flight at once, split between the worker processes
+DNS_CONCURRENCY = 200
+
+# Worker processes validating domain shards, sharing the SMTP connection budget
+PROCESS_COUNT = os.cpu_count() or 1
+SHARDS_PER_PROCESS = 4
+MAX_CONNECTIONS = 500
+
+# SMTP sessions open at once to the mail servers of a single domain
+SESSIONS_PER_DOMAIN = 5
+
+# Session slots per domain, created afresh for the event loop of each shard
+_session_slots = {}
+
+# Large providers reject RCPT probes from unknown senders, so their MX is trusted
+_WELL_KNOWN = frozenset({
+    'gmail.com', 'googlemail.com', 'outlook.com', 'hotmail.com', 'live.com', 'msn.com',
+    'yahoo.com', 'ymail.com', 'icloud.com', 'me.com', 'mac.com', 'aol.com',
+})
 
 def check_syntax(email):
     """ Check if the email matches the standard email address pattern. """
-    return re.match(EMAIL_REGEX, email) is not None
+    return _EMAIL_RE.match(email) is not None
 
-def check_mail_server(domain):
-    """ Check if the domain has MX records. """
+async def gather_bounded(limit, coroutines):
+    """ Run coroutines concurrently, at most `limit` at a time, and return their results or exceptions. """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def bounded(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*(bounded(coroutine) for coroutine in coroutines), return_exceptions=True)
+
+def _by_preference(mx_records):
+    """ Return MX hostnames ordered from the most to the least preferred server. """
+    return tuple(mx.exchange.to_text().rstrip('.') for mx in sorted(mx_records, key=lambda mx: mx.preference))
+
+async def resolve_mx(domain):
+    """ Resolve the MX hostnames of a domain without blocking the event loop. """
     try:
-        mx_records = dns.resolver.resolve(domain, 'MX')
-        return len(mx_records) > 0
+        mx_records = await _RESOLVER.resolve(domain, 'MX')
+        return domain, _by_preference(mx_records)
     except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
-        return False
-    except Timeout:
-        return False
+        return domain, ()
+    except Exception as e:
+        logging.error(f"Error resolving MX records for {domain}: {e}")
+        return domain, None
+
+async def prefetch_mx(domains):
+    """ Resolve MX records for all domains concurrently and fill the cache. """
+    limit = max(1, DNS_CONCURRENCY // PROCESS_COUNT)
+    for domain, mx_hosts in await gather_bounded(limit, map(resolve_mx, domains)):
+        if mx_hosts is not None:  # Failed lookups are retried by the checks
+            _mx_cache[domain] = mx_hosts
+
+async def _mx_for(domain):
+    """ Return the MX hostnames of a domain, resolving it on a cache miss. """
+    mx_hosts = _mx_cache.get(domain)
+    if mx_hosts is None:
+        try:
+            mx_records = await _RESOLVER.resolve(domain, 'MX')
+            mx_hosts = _by_preference(mx_records)
+        except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
+            mx_hosts = ()
+        _mx_cache[domain] = mx_hosts
+    return mx_hosts
 
-def check_connection(email):
-    """ Check if we can establish an SMTP connection to the email domain. """
-    domain = email.split('@')[1]
+@asynccontextmanager
+async def _smtp_session(domain):
+    """ Open an SMTP session to the domain's mail servers in preference order, falling back on failure. """
+    slots = _session_slots.get(domain.lower())
+    if slots is None:
+        slots = _session_slots[domain.lower()] = asyncio.Semaphore(SESSIONS_PER_DOMAIN)
+    async with slots:
+        server = None
+        error = aiosmtplib.SMTPConnectError(f"No mail server found for {domain}")
+        for mx_record in await _mx_for(domain):
+            try:
+                server = aiosmtplib.SMTP(hostname=mx_record, port=25, timeout=10, start_tls=False)
+                await server.connect()
+                break
+            except aiosmtplib.SMTPConnectError as e:
+                server, error = None, e
+        if server is None:
+            raise error
+        try:
+            yield server
+        finally:
+            try:
+                await server.quit()
+            except aiosmtplib.SMTPException:
+                server.close()
+
+async def _rcpt(server, recipient):
+    """ Send RCPT TO and return the reply code and message, also when it is refused. """
+    try:
+        response = await server.rcpt(recipient)
+        return response.code, response.message
+    except aiosmtplib.SMTPRecipientRefused as e:
+        return e.code, e.message
+
+async def check_mail_server(domain):
+    """ Check if the domain has MX records. """
     try:
-        mx_records = dns.resolver.resolve(domain, 'MX')
-        mx_record = str(mx_records[0].exchange)
-        with smtplib.SMTP(mx_record, timeout=10) as server:
-            server.ehlo_or_helo_if_needed()
-        return True
+        return len(await _mx_for(domain)) > 0
     except Exception as e:
+        logging.error(f"Error resolving MX records for {domain}: {e}")
         return False
 
-def is_gmail_domain(domain):
-    """ Check if the domain is 'gmail.com'. """
-    return domain.lower() == 'gmail.com'
-
-def check_catch_all(domain):
-    """ Check if the domain has a catch-all email address enabled. """
+async def probe_mailbox(domain, email):
+    """ Probe for a catch-all and then for the mailbox itself over a single SMTP session. """
+    # Concurrent checks of a domain wait for the catch-all verdict of the first one
+    verdict = _catch_all_cache.get(domain)
+    catch_all = None if verdict is None else await verdict
+    if catch_all is _UNREACHABLE:
+        return "Cannot connect to mail server"
+    if catch_all:
+        return "Domain has catch-all enabled"
+    if catch_all is None:
+        verdict = _catch_all_cache[domain] = asyncio.get_running_loop().create_future()
     try:
-        mx_records = dns.resolver.resolve(domain, 'MX')
-        mx_record = str(mx_records[0].exchange)
-        with smtplib.SMTP(mx_record, timeout=10) as server:
-            server.ehlo_or_helo_if_needed()
-
-            if is_gmail_domain(domain):
-                server.mail('test@gmail.com')
-                code, message = server.rcpt('fake-email@gmail.com')
-                return code != 550
-            else:
-                server.mail('test@example.com')
-                code, message = server.rcpt(f'fake-email@{domain}')
-                return code == 250
+        async with _smtp_session(domain) as server:
+            await server.mail('test@example.com')  # Greets with EHLO/HELO first
+            if catch_all is None:
+                # A random address is only accepted by servers that accept everything
+                code, message = await _rcpt(server, f'{uuid.uuid4().hex}@{domain}')
+                catch_all = code == 250
+                verdict.set_result(catch_all)
+                if catch_all:
+                    return "Domain has catch-all enabled"
+            code, message = await _rcpt(server, email)
+            return "Valid" if code in (250, 251) else "Cannot connect to mail server"
     except Exception as e:
-        return False
+        logging.error(f"Error connecting to mail server for {email}: {e}")
+        return "Cannot connect to mail server"
+    finally:
+        if catch_all is None:  # The waiting checks would not reach the mail server either
+            _catch_all_cache.pop(domain, None)  # A later check probes again
+            verdict.set_result(_UNREACHABLE)
 
-def validate_email(email):
-    """ Validate an email address using various checks. """
-    if not check_syntax(email):
-        return email, "Invalid syntax"
-    
-    domain = email.split('@')[1]
-    
-    if not check_mail_server(domain):
+async def validate_address(domain, email):
+    """ Validate a well-formed email address of the given domain. """
+    if not await check_mail_server(domain):
         return email, "No MX records found"
     
-    if not check_connection(email):
-        return email, "Cannot connect to mail server"
+    if domain.lower() in _WELL_KNOWN:
+        return email, "Valid"
     
-    if check_catch_all(domain):
-        return email, "Domain has catch-all enabled"
+    return email, await probe_mailbox(domain, email)
+
+async def validate_email(email):
+    """ Validate an email address using various checks. """
+    if not check_syntax(email):
+        return email, "Invalid syntax"
     
-    return email, "Valid"
+    return await validate_address(email.rpartition('@')[2], email)
+
+def _take_turns(groups):
+    """ Yield (domain, email) pairs taking one address of each domain in turn, spreading out each domain's checks. """
+    pairs = [[(domain, email) for email in emails] for domain, emails in groups]
+    for turn in itertools.zip_longest(*pairs):
+        yield from filter(None, turn)
+
+async def _check_shard(groups):
+    """ Resolve the MX records of a shard's domains, then validate its addresses. """
+    await prefetch_mx(domain for domain, _ in groups)
+    limit = max(1, MAX_CONNECTIONS // PROCESS_COUNT)
+    addresses = list(_take_turns(groups))
+    results = await gather_bounded(limit, (validate_address(domain, email) for domain, email in addresses))
+    shard_results = []
+    for (domain, email), result in zip(addresses, results):
+        if isinstance(result, Exception):  # Report the address instead of failing the whole shard
+            logging.error(f"Error validating {email}: {result}")
+            result = email, "Cannot connect to mail server"
+        shard_results.append(result)
+    return shard_results
+
+def _validate_shard(groups):
+    """ Validate the (domain, emails) groups of one shard on an event loop inside a worker process. """
+    _session_slots.clear()  # Slots of the previous shard belong to its closed event loop
+    return run_event_loop(_check_shard(groups))
 
 def validate_emails(email_list):
     """ Validate a list of email addresses and return results. """
-    results = []
-    total_emails = len(email_list)
+    unique_emails = list(dict.fromkeys(email_list))
+    status_by_email = {}
+    total_emails = len(unique_emails)
+    emails_by_domain = defaultdict(list)
+    for email in unique_emails:
+        if check_syntax(email):
+            emails_by_domain[email.rpartition('@')[2]].append(email)
+        else:
+            status_by_email[email] = "Invalid syntax"
+
+    # Keep every domain in a single shard, which resolves its MX records in its worker process
+    shard_count = PROCESS_COUNT * SHARDS_PER_PROCESS
+    shards = [[] for _ in range(shard_count)]
+    for domain, emails in emails_by_domain.items():
+        shards[hash(domain) % shard_count].append((domain, emails))
     
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = [executor.submit(validate_email, email) for email in email_list]
-        
-        for future in as_completed(futures):
-            results.append(future.result())
-            print(f"Processed: {len(results)}/{total_emails}", end='\r')
+    with mp.Pool(PROCESS_COUNT) as pool:
+        for shard_results in pool.imap_unordered(_validate_shard, shards):
+            status_by_email.update(shard_results)
+            print(f"Processed: {len(status_by_email)}/{total_emails}", end='\r')
     
     print("\nValidation complete.")
-    return results
 
-def get_user_emails():
-    """ Prompt user to enter email addresses. """
+    # Report every input row, including repeated addresses
+    return [(email, status_by_email[email]) for email in email_list]
+
+def read_emails(lines):
+    """ Collect one email address per non-empty line, skipping a 'done' marker. """
+    return [email for line in lines if (email := line.strip()) and email.lower() != 'done']
+
+def get_user_emails(path=None):
+    """ Read email addresses from a file or piped stdin, or prompt the user for them. """
+    if path is not None:
+        with open(path) as email_file:
+            return read_emails(email_file.read().splitlines())
+    if not sys.stdin.isatty():
+        return read_emails(sys.stdin.read().splitlines())
+
     email_list = []
     while True:
         email = input("Enter an email address (or 'done' to finish): ").strip()
@@ -104,30 +278,79 @@ def get_user_emails():
 # Ensure the directory exists before writing files
 os.makedirs('outputs', exist_ok=True)
 
+def open_sheet(stack, filename, sheet_name, columns):
+    """ Open a workbook on `stack` and return a function that appends one row, flushing it to disk. """
+    import xlsxwriter  # Only needed for --xlsx, keep it off the default path
+    workbook = xlsxwriter.Workbook(filename, {'constant_memory': True, 'strings_to_formulas': False,
+                                              'strings_to_urls': False})
+    stack.callback(workbook.close)
+    worksheet = workbook.add_worksheet(sheet_name)
+    worksheet.write_row(0, 0, columns)
+    row_numbers = itertools.count(1)
+    return lambda row: worksheet.write_row(next(row_numbers), 0, row)
+
+# Spreadsheet programs evaluate CSV cells starting with these characters as formulas
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+def _as_text(row):
+    """ Quote a leading formula character of raw input that failed the syntax check. """
+    # Addresses that passed the syntax check cannot hold a formula and are written as they are
+    email, status = row
+    if status == "Invalid syntax" and email.startswith(_FORMULA_PREFIXES):
+        return f"'{email}", status
+    return row
+
+def open_csv(stack, filename, sheet_name, columns):
+    """ Open a CSV file on `stack` below a header line and return a function that appends one row. """
+    csv_file = stack.enter_context(open(filename, 'w', newline=''))
+    writer = csv.writer(csv_file)
+    writer.writerow(columns)
+    return lambda row: writer.writerow(_as_text(row))
+
+def write_results(emails, valid_filename, invalid_filename, open_output):
+    """ Write each result to the valid or invalid file as it is read, creating a file only for its first row. """
+    filenames = {'Valid': valid_filename, 'Invalid': invalid_filename}
+    append_row = {}
+    with ExitStack() as stack:
+        for email, status in emails:
+            kind = 'Valid' if status == "Valid" else 'Invalid'
+            if kind not in append_row:
+                append_row[kind] = open_output(stack, filenames[kind], kind, ['Emails', 'Status'])
+            append_row[kind]((email, status))
+
+    for kind, filename in filenames.items():
+        if kind in append_row:
+            print(f"{kind} emails saved to '{filename}'")
+
 def save_to_excel(emails, valid_filename, invalid_filename):
     """ Save validation results to separate Excel files for valid and invalid emails. """
-    valid_emails = [(email, status) for email, status in emails if status == "Valid"]
-    invalid_emails = [(email, status) for email, status in emails if status != "Valid"]
-
     try:
-        if valid_emails:
-            pd.DataFrame(valid_emails, columns=['Emails', 'Status']).to_excel(valid_filename, index=False, sheet_name='Valid')
-            print(f"Valid emails saved to '{valid_filename}'")
+        write_results(emails, valid_filename, invalid_filename, open_sheet)
+    except Exception as e:
+        print(f"Error saving to files: {e}")
 
-        if invalid_emails:
-            pd.DataFrame(invalid_emails, columns=['Emails', 'Status']).to_excel(invalid_filename, index=False, sheet_name='Invalid')
-            print(f"Invalid emails saved to '{invalid_filename}'")
+def save_to_csv(emails, valid_filename, invalid_filename):
+    """ Save validation results to separate CSV files for valid and invalid emails. """
+    try:
+        write_results(emails, valid_filename, invalid_filename, open_csv)
     except Exception as e:
         print(f"Error saving to files: {e}")
 
 # Main program flow
 if __name__ == "__main__":
-    email_list = get_user_emails()
+    parser = argparse.ArgumentParser(description="Validate email addresses.")
+    parser.add_argument('-i', '--input', help="read email addresses from this file, one per line")
+    parser.add_argument('--xlsx', action='store_true', help="save results as Excel workbooks instead of CSV")
+    args = parser.parse_args()
+
+    email_list = get_user_emails(args.input)
     if email_list:
         results = validate_emails(email_list)
-        valid_filename = 'outputs/valid_emails.xlsx'
-        invalid_filename = 'outputs/invalid_emails.xlsx'
-        save_to_excel(results, valid_filename, invalid_filename)
+        extension = 'xlsx' if args.xlsx else 'csv'
+        valid_filename = f'outputs/valid_emails.{extension}'
+        invalid_filename = f'outputs/invalid_emails.{extension}'
+        save_results = save_to_excel if args.xlsx else save_to_csv
+        save_results(results, valid_filename, invalid_filename)
         
         print("\nDetailed results:")
         for email, status in results: